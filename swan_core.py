@@ -0,0 +1,469 @@
+"""Extraction and analysis behind the SWAN Marking Assistant.
+
+Nothing in here depends on Streamlit; swan_2.py is the UI shell that calls
+into this module and handles caching across reruns.
+"""
+import io
+import posixpath
+import re
+import zipfile
+from itertools import islice
+
+from lxml import etree
+from openpyxl import load_workbook
+from pptx import Presentation
+
+# -----------------------------
+# Config
+# -----------------------------
+SHORT_PARAGRAPH_LIMIT = 260
+
+# Guards so pathological uploads can't make the analysis unbounded
+MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+MAX_VOCAB_WORDS = 100_000
+
+SENTENCE_SPLIT_RE = re.compile(r"[.!?]")
+WORD_RE = re.compile(r"\b[a-zA-Z]{3,}\b")
+# ASCII fast path for WORD_RE: blank out every non-word character, split,
+# and keep all-letter tokens of 3+ characters. Gives the same words.
+ASCII_WORD_TABLE = str.maketrans(
+    {c: " " for c in map(chr, range(128)) if not (c.isalnum() or c == "_")}
+)
+
+# Uploads are untrusted: never expand entities, as python-docx's parser did
+XML_PARSER = etree.XMLParser(resolve_entities=False)
+
+# OPC package relationships used to find the parts of a .docx
+RELS_NS = {"rel": "http://schemas.openxmlformats.org/package/2006/relationships"}
+REL_OFFICE_DOCUMENT = "/officeDocument"
+REL_STYLES = "/styles"
+
+# WordprocessingML names used when reading .docx XML directly
+W_NAMESPACE = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+W_NS = {"w": W_NAMESPACE}
+W_P = f"{{{W_NAMESPACE}}}p"
+W_T = f"{{{W_NAMESPACE}}}t"
+W_BR = f"{{{W_NAMESPACE}}}br"
+W_TYPE = f"{{{W_NAMESPACE}}}type"
+W_VAL = f"{{{W_NAMESPACE}}}val"
+W_STYLE_ID = f"{{{W_NAMESPACE}}}styleId"
+# Text-bearing children of the paragraph's own runs (direct or inside a
+# hyperlink), as python-docx reads them. Text boxes nested in a run's
+# drawing are deliberately not reached.
+W_RUN_CONTENT = etree.XPath(
+    "./w:r/*[self::w:t or self::w:tab or self::w:ptab or self::w:br"
+    " or self::w:cr or self::w:noBreakHyphen]"
+    " | ./w:hyperlink/w:r/*[self::w:t or self::w:tab or self::w:ptab"
+    " or self::w:br or self::w:cr or self::w:noBreakHyphen]",
+    namespaces=W_NS,
+)
+W_RUN_CONTENT_TEXT = {
+    f"{{{W_NAMESPACE}}}tab": "\t",
+    f"{{{W_NAMESPACE}}}ptab": "\t",
+    f"{{{W_NAMESPACE}}}cr": "\n",
+    f"{{{W_NAMESPACE}}}noBreakHyphen": "-",
+}
+
+# -----------------------------
+# Extraction helpers
+# -----------------------------
+# Extractors take the raw upload bytes so callers can cache on the content.
+def _parse_part(archive, part_name):
+    return etree.fromstring(archive.read(part_name), XML_PARSER)
+
+def _related_part(archive, source_name, rel_type):
+    # Resolve the first internal relationship of rel_type from source_name
+    # ("" for the package itself) to a part name inside the zip. Matching on
+    # the type's suffix accepts both transitional and strict OOXML.
+    source_dir, source_file = posixpath.split(source_name)
+    try:
+        rels = _parse_part(archive, posixpath.join(source_dir, "_rels", source_file + ".rels"))
+    except KeyError:
+        return None
+    for rel in rels.iterfind("rel:Relationship", RELS_NS):
+        if rel.get("TargetMode") == "External" or not rel.get("Type", "").endswith(rel_type):
+            continue
+        target = rel.get("Target", "")
+        if target.startswith("/"):
+            return posixpath.normpath(target[1:])
+        return posixpath.normpath(posixpath.join(source_dir, target))
+    return None
+
+def _docx_style_names(archive, main_part):
+    # Map paragraph style ids to display names ("heading 1" -> "Heading 1",
+    # matching the names Word and python-docx show for built-in styles).
+    styles_part = _related_part(archive, main_part, REL_STYLES)
+    if styles_part is None:
+        return {}
+    try:
+        styles = _parse_part(archive, styles_part)
+    except KeyError:
+        return {}
+    names = {}
+    for style in styles.iterfind("w:style", W_NS):
+        name = style.find("w:name", W_NS)
+        if name is None:
+            continue
+        display = name.get(W_VAL, "")
+        if display.startswith("heading "):
+            display = display.capitalize()
+        names[style.get(W_STYLE_ID)] = display
+    return names
+
+def _run_content_text(el):
+    if el.tag == W_T:
+        return el.text or ""
+    if el.tag == W_BR:
+        # Only line breaks are text; page and column breaks are not.
+        return "\n" if el.get(W_TYPE, "textWrapping") == "textWrapping" else ""
+    return W_RUN_CONTENT_TEXT[el.tag]
+
+def extract_text_from_docx(data):
+    # Read-only pass straight over the main document XML: python-docx would
+    # wrap every paragraph and style in objects we never use. One walk
+    # collects the text and the heading/bullet signals together.
+    paragraphs = []
+    heading_count = 0
+    has_bullets = False
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        main_part = _related_part(archive, "", REL_OFFICE_DOCUMENT)
+        if main_part is None or main_part not in archive.namelist():
+            return paragraphs, heading_count, has_bullets
+        document = _parse_part(archive, main_part)
+        style_names = _docx_style_names(archive, main_part)
+    body = document.find("w:body", W_NS)
+    if body is None:
+        return paragraphs, heading_count, has_bullets
+    for p in body.iterchildren(W_P):
+        style = p.find("w:pPr/w:pStyle", W_NS)
+        style_name = style_names.get(style.get(W_VAL), "") if style is not None else ""
+        if style_name.startswith("Heading"):
+            heading_count += 1
+        if "List" in style_name:
+            has_bullets = True
+        text = "".join(map(_run_content_text, W_RUN_CONTENT(p)))
+        if not text:
+            continue
+        text = text.strip()
+        if text:
+            paragraphs.append(text)
+    return paragraphs, heading_count, has_bullets
+
+def _scan_sheet(ws, add_block):
+    # add_block is the caller's bound list.append, so cells go straight into
+    # the workbook's text blocks without a per-sheet list.
+    add_block(f"Sheet: {ws.title}")
+    for row in ws.iter_rows(values_only=True):
+        for value in row:
+            if value is None:
+                continue
+            # Text cells only need stripping; numbers, dates and
+            # booleans never format with padding or as "".
+            if value.__class__ is str:
+                value = value.strip()
+                if value:
+                    add_block(value)
+            else:
+                add_block(str(value))
+
+def extract_text_from_xlsx(data):
+    # Only the cell text is needed, so stream values straight from openpyxl
+    # in read-only mode instead of building a DataFrame per sheet.
+    # Sheets are scanned one after another: openpyxl parses in pure Python
+    # under the GIL, so a thread pool over sheets was measured slower.
+    wb = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    text_blocks = []
+    add_block = text_blocks.append
+    try:
+        for ws in wb.worksheets:
+            # Read-only sheets trust the file's <dimension> record, which some
+            # exporters write stale (e.g. "A1"); reset it so every row is read.
+            ws.reset_dimensions()
+            _scan_sheet(ws, add_block)
+    finally:
+        wb.close()
+    return text_blocks, 0, False
+
+def extract_text_from_pptx(data):
+    prs = Presentation(io.BytesIO(data))
+    text_blocks = []
+    for slide_idx, slide in enumerate(prs.slides, start=1):
+        slide_text = []
+        for shape in slide.shapes:
+            if not shape.has_text_frame:
+                continue
+            text = shape.text_frame.text
+            if not text:
+                continue
+            text = text.strip()
+            if text:
+                slide_text.append(text)
+        if slide_text:
+            text_blocks.append(f"Slide {slide_idx}:")
+            text_blocks.extend(slide_text)
+    return text_blocks, 0, False
+
+def extract_text(data, ext):
+    # Returns (paragraphs, heading_count, has_bullets)
+    if ext == ".docx":
+        return extract_text_from_docx(data)
+    elif ext == ".xlsx":
+        return extract_text_from_xlsx(data)
+    elif ext == ".pptx":
+        return extract_text_from_pptx(data)
+    else:
+        return [], 0, False
+
+# -----------------------------
+# Low-level analysis helpers
+# -----------------------------
+def has_short_paragraphs(paragraphs):
+    return any(len(p) < SHORT_PARAGRAPH_LIMIT for p in paragraphs)
+
+def sentence_lengths(text):
+    counts = map(len, map(str.split, SENTENCE_SPLIT_RE.split(text)))
+    return [n for n in counts if n > 0]
+
+def find_words(text):
+    # str.translate + split beats the regex on ASCII text, but falls behind
+    # once non-ASCII characters (e.g. Word's curly quotes) are present.
+    if text.isascii():
+        return [w for w in text.translate(ASCII_WORD_TABLE).split() if len(w) >= 3 and w.isalpha()]
+    return WORD_RE.findall(text)
+
+def vocab_stats(paragraphs):
+    # Words are streamed paragraph by paragraph into the distinct-word set,
+    # so only one paragraph's matches are held at a time rather than a word
+    # list for the whole document. The pattern is ASCII-only, so lowercasing
+    # the matches is enough to make the count case-insensitive.
+    # Only the first MAX_VOCAB_WORDS words are counted.
+    unique = set()
+    total = 0
+    for p in paragraphs:
+        remaining = MAX_VOCAB_WORDS - total
+        if len(p) < 4 * remaining:
+            # A word is 3+ letters plus a separator, so this paragraph can't
+            # hold more than `remaining` words: tokenise it in one go.
+            words = find_words(p)
+        else:
+            # Possibly past the cap: stop scanning once it is reached.
+            words = [m.group() for m in islice(WORD_RE.finditer(p), remaining)]
+        total += len(words)
+        unique.update(map(str.lower, words))
+        if total >= MAX_VOCAB_WORDS:
+            break
+    if not total:
+        return 0.0, 0
+    return len(unique) / total, total
+
+def detect_tone(lower_text):
+    informal_markers = ["gonna", "wanna", "yeah", "kinda", "sort of", "like,"]
+    formal_markers = ["therefore", "however", "in conclusion", "moreover", "furthermore"]
+    informal = any(w in lower_text for w in informal_markers)
+    formal = any(w in lower_text for w in formal_markers)
+    if formal and not informal:
+        return "mostly formal"
+    if informal and not formal:
+        return "quite informal"
+    if formal and informal:
+        return "a mix of formal and informal"
+    return "neutral"
+
+def estimate_cefr(avg_len, vocab_ratio):
+    # Very rough, gentle estimate
+    if avg_len < 8 and vocab_ratio < 0.25:
+        return "around A2 level"
+    if 8 <= avg_len <= 18 and 0.25 <= vocab_ratio <= 0.4:
+        return "around B1 level"
+    if avg_len > 18 and vocab_ratio > 0.35:
+        return "moving towards B2 level"
+    return "somewhere between A2 and B1 level"
+
+# -----------------------------
+# Main SWAN student analysis
+# -----------------------------
+def analyse_student_writing(paragraphs, heading_count, has_bullets, ext):
+    strengths = []
+    weaknesses = []
+    actions = []
+    next_steps = []
+
+    if not paragraphs:
+        weaknesses.append("There wasn’t any clear text to read in your file, so it’s hard to comment on your writing.")
+        next_steps.append("Try uploading a version that includes your full writing, not just a blank template or image.")
+        summary = "I couldn’t really see your writing this time, so I can’t give proper feedback yet."
+        metrics = {}
+        return strengths, weaknesses, actions, next_steps, summary, metrics
+
+    text = " ".join(paragraphs)
+    lower_text = text.lower()
+
+    # STRUCTURE (Word only)
+    if ext == ".docx":
+        if heading_count >= 1:
+            strengths.append("You’ve started to organise your work with headings, which helps the reader follow your ideas.")
+        else:
+            weaknesses.append("At the moment, your work doesn’t really use headings to guide the reader.")
+            actions.append("Try adding simple headings to show where each new idea or section begins.")
+
+        if has_bullets:
+            strengths.append("You use bullet points in places, which can make key information stand out clearly.")
+        else:
+            weaknesses.append("Some of your ideas are in long blocks of text and could be clearer as bullet points.")
+            actions.append("Where you list examples or points, try using bullet points to make them easier to read.")
+
+    # PARAGRAPH DEVELOPMENT
+    if not has_short_paragraphs(paragraphs):
+        strengths.append("Your paragraphs generally have enough detail to explain your ideas clearly.")
+    else:
+        weaknesses.append("Some of your paragraphs are quite short and feel like they stop before the idea is fully explained.")
+        actions.append("Choose one short paragraph and add an extra sentence that gives an example or explains your point more.")
+
+    # CONCLUSION (a single paragraph has no separate ending to check)
+    if len(paragraphs) >= 2:
+        last_para = paragraphs[-1].lower()
+        if any(p in last_para for p in ["in conclusion", "overall", "to sum up", "in summary"]):
+            strengths.append("You’ve tried to round off your writing with a concluding idea, which helps give it a clear ending.")
+        else:
+            weaknesses.append("Your writing finishes quite suddenly without a clear final sentence to bring your ideas together.")
+            actions.append("Add a short final sentence that sums up your main point or how you feel about the topic.")
+
+    # SENTENCE VARIETY
+    lengths = sentence_lengths(text)
+    if lengths:
+        avg_len = sum(lengths) / len(lengths)
+        length_spread = max(lengths) - min(lengths)
+        if avg_len < 9:
+            weaknesses.append("A lot of your sentences are very short, which can make the writing feel a bit choppy.")
+            actions.append("Try joining two short sentences together using a linking word like 'because', 'so' or 'which'.")
+        elif avg_len > 24:
+            weaknesses.append("Some of your sentences are quite long, which can make them harder to follow.")
+            actions.append("Pick one long sentence and see if you can split it into two shorter ones without losing meaning.")
+        else:
+            strengths.append("You use a mix of shorter and longer sentences, which helps your writing flow more naturally.")
+    else:
+        avg_len = 0
+        length_spread = 0
+
+    # VOCABULARY
+    vocab_ratio, total_words = vocab_stats(paragraphs)
+    if total_words > 0:
+        if vocab_ratio > 0.4:
+            strengths.append("You’re beginning to use a good range of vocabulary, which makes your writing more interesting to read.")
+        elif vocab_ratio < 0.25:
+            weaknesses.append("You repeat some words quite a lot, which can make the writing feel a bit limited.")
+            actions.append("Choose one common word you use a lot and try replacing it with a different word in one or two places.")
+
+    # LINKING WORDS
+    LINKERS = [
+        "however", "therefore", "in addition", "furthermore", "moreover",
+        "for example", "for instance", "as a result", "on the other hand"
+    ]
+    if any(l in lower_text for l in LINKERS):
+        strengths.append("You’ve started to use linking phrases to connect your ideas, which helps the reader follow your thinking.")
+    else:
+        weaknesses.append("Your ideas sometimes feel like separate points rather than a joined-up piece of writing.")
+        actions.append("Try adding phrases like 'for example', 'as a result' or 'in addition' to show how your ideas connect.")
+
+    # ARGUMENT / EXPLANATION
+    ARG_MARKERS = ["because", "this shows", "this suggests", "so that", "therefore", "as a result"]
+    if any(m in lower_text for m in ARG_MARKERS):
+        strengths.append("You don’t just make points – you also try to explain or justify them, which is a really positive skill.")
+    else:
+        weaknesses.append("Sometimes you make a point but don’t fully explain why it matters or what it shows.")
+        actions.append("After making a point, add a short phrase like 'this shows that…' or 'this is important because…'.")
+
+    # METRICS / GENTLE SCORES
+    tone = detect_tone(lower_text)
+    cefr = estimate_cefr(avg_len, vocab_ratio)
+    # Soft, gentle 1–5 style feelings
+    clarity_score = 3
+    variety_score = 3
+    vocab_score = 3
+
+    if avg_len and 10 <= avg_len <= 20:
+        clarity_score = 4
+    if avg_len and (avg_len < 7 or avg_len > 26):
+        clarity_score = 2
+
+    if lengths and length_spread > 10:
+        variety_score = 4
+    elif lengths and length_spread < 5:
+        variety_score = 2
+
+    if vocab_ratio > 0.4:
+        vocab_score = 4
+    elif vocab_ratio < 0.25:
+        vocab_score = 2
+
+    metrics = {
+        "clarity": clarity_score,
+        "variety": variety_score,
+        "vocab": vocab_score,
+        "tone": tone,
+        "cefr": cefr
+    }
+
+    # OVERALL SUMMARY (Style L – short paragraph)
+    summary_parts = []
+    summary_parts.append(
+        "You’ve made a thoughtful start here, and it’s clear you’re trying to express your ideas in a clear and organised way."
+    )
+    if strengths:
+        summary_parts.append(
+            "Some parts of your writing already work well, especially where you explain your points or use structure to guide the reader."
+        )
+    if weaknesses:
+        summary_parts.append(
+            "At times, your ideas feel a little brief or jump from one point to another, but this is something that improves naturally with practice."
+        )
+    if vocab_score >= 3:
+        summary_parts.append(
+            "Your vocabulary choices show potential, and you’re beginning to experiment with different ways of expressing yourself."
+        )
+    summary_parts.append(
+        "With a bit more detail and a focus on linking your ideas smoothly, your writing will continue to grow in confidence."
+    )
+    summary = " ".join(summary_parts)
+
+    # NEXT STEPS – always a few gentle, practical ideas
+    next_steps.append("Read your work aloud slowly and check that each sentence flows naturally into the next one.")
+    next_steps.append("Choose one paragraph and see if you can add one extra sentence that gives an example or explains your point more clearly.")
+    next_steps.append("Look for one place where you can add a linking phrase like 'for example', 'as a result' or 'in addition' to join ideas together.")
+
+    return strengths, weaknesses, actions, next_steps, summary, metrics
+
+# -----------------------------
+# Entry points
+# -----------------------------
+def run_swan_analysis(data, ext):
+    if len(data) > MAX_UPLOAD_BYTES:
+        weaknesses = ["This file is too large for me to analyse, so I haven’t been able to read your writing."]
+        next_steps = ["Try uploading just your written work on its own, without large images or extra sheets."]
+        summary = "Your file was too big to analyse this time, so I can’t give proper feedback yet."
+        return [], weaknesses, [], next_steps, summary, {}
+    paragraphs, heading_count, has_bullets = extract_text(data, ext)
+    return analyse_student_writing(paragraphs, heading_count, has_bullets, ext)
+
+def build_report_text(file_name, strengths, weaknesses, actions, next_steps, summary, metrics):
+    report_text = (
+        f"SWAN Feedback Report: {file_name}\n"
+        + "="*30 + "\n\n"
+        + "OVERALL SUMMARY:\n"
+        + summary + "\n\n"
+        + "STRENGTHS:\n" + "\n".join(f"- {s}" for s in strengths) + "\n\n"
+        + "THINGS TO KEEP WORKING ON:\n" + "\n".join(f"- {w}" for w in weaknesses) + "\n\n"
+        + "ACTIONS YOU CAN TAKE:\n" + "\n".join(f"- {a}" for a in actions) + "\n\n"
+        + "NEXT STEPS:\n" + "\n".join(f"- {n}" for n in next_steps) + "\n\n"
+    )
+
+    if metrics:
+        report_text += (
+            "GENTLE DEEPER INSIGHTS:\n"
+            f"- Clarity feels around {metrics['clarity']} out of 5.\n"
+            f"- Sentence variety feels around {metrics['variety']} out of 5.\n"
+            f"- Vocabulary range feels around {metrics['vocab']} out of 5.\n"
+            f"- Tone: {metrics['tone']}.\n"
+            f"- Overall level: {metrics['cefr']}.\n"
+        )
+    return report_text